@@ -1,212 +1,303 @@
 #!/usr/bin/env python3
 
-import yaml
 import json
 import re
-from pathlib import Path
+import sys
+from collections import namedtuple
+
+# A model ID such as 'anthropic/claude-3.7-sonnet:thinking' split into its parts
+ModelKey = namedtuple('ModelKey', ['provider', 'name', 'base', 'suffix', 'full'])
+
+# Lookup tables built once from the OpenRouter model list
+ModelIndex = namedtuple('ModelIndex', ['categories', 'all_models', 'free_models', 'latest_by_base', 'by_provider', 'trie_by_provider'])
+
+# Category headers in the OpenRouter output look like ---NAME---
+CATEGORY_HEADER_RE = re.compile(r'\A-{3,}(.+?)-{3,}\Z')
+
+# Runs of digits in a model ID, compared numerically when ordering versions
+VERSION_NUMBER_RE = re.compile(r'\d+')
+
+# Model family mappings for major version upgrades
+MODEL_FAMILIES = {
+    'anthropic/claude-3.7-sonnet': ('anthropic/claude-4-sonnet', 'anthropic/claude-4'),
+    'anthropic/claude-3.7-sonnet:thinking': ('anthropic/claude-4-sonnet:thinking', 'anthropic/claude-4:thinking'),
+    'anthropic/claude-3.5-sonnet': ('anthropic/claude-4-sonnet', 'anthropic/claude-4'),
+    'anthropic/claude-3.5-sonnet:thinking': ('anthropic/claude-4-sonnet:thinking', 'anthropic/claude-4:thinking'),
+    'anthropic/claude-3-opus': ('anthropic/claude-4-opus', 'anthropic/claude-4'),
+    'anthropic/claude-3-opus:thinking': ('anthropic/claude-4-opus:thinking', 'anthropic/claude-4:thinking'),
+    'anthropic/claude-3-haiku': ('anthropic/claude-4-haiku', 'anthropic/claude-4'),
+    'anthropic/claude-3-haiku:thinking': ('anthropic/claude-4-haiku:thinking', 'anthropic/claude-4:thinking'),
+    'openai/gpt-4': ('openai/gpt-4o', 'openai/gpt-4o-latest'),
+    'openai/gpt-4-turbo': ('openai/gpt-4o', 'openai/gpt-4o-latest'),
+    'openai/gpt-4-turbo-preview': ('openai/gpt-4o', 'openai/gpt-4o-latest'),
+    'openai/gpt-4-1106-preview': ('openai/gpt-4o', 'openai/gpt-4o-latest'),
+    'openai/gpt-4-0125-preview': ('openai/gpt-4o', 'openai/gpt-4o-latest'),
+    'openai/gpt-4-0613': ('openai/gpt-4o', 'openai/gpt-4o-latest'),
+    'openai/gpt-4-0314': ('openai/gpt-4o', 'openai/gpt-4o-latest'),
+    'openai/gpt-3.5-turbo': ('openai/gpt-4o-mini', 'openai/o4-mini'),
+    'openai/gpt-3.5-turbo-16k': ('openai/gpt-4o-mini', 'openai/o4-mini'),
+    'google/gemini-2.0': ('google/gemini-2.5-pro', 'google/gemini-2.5-pro-exp-03-25'),
+    'google/gemini-1.5': ('google/gemini-2.5-pro', 'google/gemini-2.5-pro-exp-03-25'),
+    'google/gemini-1.0': ('google/gemini-2.5-pro', 'google/gemini-2.5-pro-exp-03-25'),
+    'deepseek/deepseek-chat-v2': ('deepseek/deepseek-chat-v3', 'deepseek/deepseek-chat-v3-0324'),
+    'deepseek/deepseek-chat-v1': ('deepseek/deepseek-chat-v3', 'deepseek/deepseek-chat-v3-0324'),
+    'x-ai/grok-2': ('x-ai/grok-3', 'x-ai/grok-3-beta'),
+    'x-ai/grok-1': ('x-ai/grok-3', 'x-ai/grok-3-beta'),
+    'mistralai/mistral-7b': ('mistralai/mistral-8x7b', 'mistralai/mistral-large'),
+    'mistralai/mistral-medium': ('mistralai/mistral-large', 'mistralai/mistral-large-latest'),
+    'meta-llama/llama-2': ('meta-llama/llama-3', 'meta-llama/llama-3.1'),
+    'meta-llama/llama-2-70b': ('meta-llama/llama-3.1-70b', 'meta-llama/llama-3.1-405b'),
+    'meta-llama/llama-2-13b': ('meta-llama/llama-3.1-8b', 'meta-llama/llama-3.1-70b'),
+    'meta-llama/llama-2-7b': ('meta-llama/llama-3.1-8b', 'meta-llama/llama-3.1-70b'),
+}
+
+# Replacement mappings for common invalid models
+REPLACEMENT_MAPPINGS = {
+    'google/gemini-2.5-flash-preview': 'google/gemini-2.5-pro-exp-03-25',
+    'google/gemini-2.5-flash-preview:thinking': 'google/gemini-2.5-pro-exp-03-25',
+    'google/gemini-2.5-pro-preview-03-25': 'google/gemini-2.5-pro-exp-03-25',
+    'google/gemini-2.5-pro-preview': 'google/gemini-2.5-pro-exp-03-25',
+    'google/gemini-2.0-flash': 'google/gemini-2.5-pro-exp-03-25',
+    'google/gemini-2.0-pro': 'google/gemini-2.5-pro-exp-03-25',
+    'google/gemini-1.5-pro': 'google/gemini-2.5-pro-exp-03-25',
+    'google/gemini-1.5-flash': 'google/gemini-2.5-pro-exp-03-25',
+    'openai/gpt-4-turbo': 'openai/gpt-4o-latest',
+    'openai/gpt-4-turbo-preview': 'openai/gpt-4o-latest',
+    'openai/gpt-4-1106-preview': 'openai/gpt-4o-latest',
+    'openai/gpt-4-0125-preview': 'openai/gpt-4o-latest',
+    'openai/gpt-4-0613': 'openai/gpt-4o-latest',
+    'openai/gpt-4-0314': 'openai/gpt-4o-latest',
+    'openai/gpt-3.5-turbo': 'openai/o4-mini',
+    'openai/gpt-3.5-turbo-16k': 'openai/o4-mini',
+    'anthropic/claude-3.5-sonnet': 'anthropic/claude-3.7-sonnet',
+    'anthropic/claude-3.5-sonnet:thinking': 'anthropic/claude-3.7-sonnet:thinking',
+    'anthropic/claude-3-opus': 'anthropic/claude-3.7-sonnet',
+    'anthropic/claude-3-opus:thinking': 'anthropic/claude-3.7-sonnet:thinking',
+    'anthropic/claude-3-haiku': 'anthropic/claude-3.7-sonnet',
+    'anthropic/claude-3-haiku:thinking': 'anthropic/claude-3.7-sonnet:thinking',
+    'deepseek/deepseek-chat-v2': 'deepseek/deepseek-chat-v3-0324',
+    'deepseek/deepseek-chat-v1': 'deepseek/deepseek-chat-v3-0324',
+    'x-ai/grok-2': 'x-ai/grok-3-beta',
+    'x-ai/grok-1': 'x-ai/grok-3-beta',
+    'mistralai/mistral-7b': 'mistralai/mistral-large',
+    'mistralai/mistral-medium': 'mistralai/mistral-large',
+    'meta-llama/llama-2': 'meta-llama/llama-3.1-8b',
+    'meta-llama/llama-2-70b': 'meta-llama/llama-3.1-70b',
+    'meta-llama/llama-2-13b': 'meta-llama/llama-3.1-8b',
+    'meta-llama/llama-2-7b': 'meta-llama/llama-3.1-8b',
+}
 
 def load_yaml_file(file_path):
     """Load YAML file safely."""
     try:
+        # Only the config file needs PyYAML, so keep it off the module import path
+        import yaml
+        
         with open(file_path, 'r', encoding='utf-8') as file:
-            return yaml.safe_load(file)
+            # Prefer the libyaml-backed loader and hand it the whole document at once
+            return yaml.load(file.read(), Loader=getattr(yaml, 'CSafeLoader', yaml.SafeLoader))
     except Exception as e:
         print(f"Error loading {file_path}: {e}")
         return None
 
-def save_yaml_file(file_path, data):
-    """Save YAML file safely."""
+def dump_yaml(data):
+    """Serialize data to YAML text safely."""
+    try:
+        import yaml
+        
+        # Dumping stays on the pure-Python emitter: libyaml escapes emoji even with allow_unicode
+        return yaml.dump(data, Dumper=yaml.SafeDumper, default_flow_style=False, allow_unicode=True, sort_keys=False)
+    except Exception as e:
+        print(f"Error serializing YAML: {e}")
+        return None
+
+def load_text_file(file_path):
+    """Load a text file, or return None if it can't be read."""
+    try:
+        with open(file_path, 'r', encoding='utf-8') as file:
+            return file.read()
+    except Exception:
+        return None
+
+def save_yaml_file(file_path, blob):
+    """Save serialized YAML text safely."""
     try:
         with open(file_path, 'w', encoding='utf-8') as file:
-            yaml.dump(data, file, default_flow_style=False, allow_unicode=True, sort_keys=False)
+            file.write(blob)
         return True
     except Exception as e:
         print(f"Error saving {file_path}: {e}")
         return False
 
-def load_openrouter_models(file_path):
-    """Load OpenRouter models from JSON file."""
+def iter_json_array(file):
+    """Iterate over a JSON array, streaming its items through ijson when it is installed."""
     try:
-        with open(file_path, 'r', encoding='utf-8') as file:
-            return json.load(file)
+        import ijson
+    except ImportError:
+        return json.load(file)
+    return ijson.items(file, 'item')
+
+def load_openrouter_models(file_path, stream=False):
+    """Load OpenRouter models from a JSON array or a newline-separated list into a model index.
+    
+    With stream=True a JSON array is read item by item instead of being parsed into a list first.
+    """
+    try:
+        with open(file_path, 'rb', buffering=1 << 20) as file:
+            # openrouter.py writes a JSON array; a plain one-ID-per-line file skips the JSON parser
+            is_json = file.read(1024).lstrip()[:1] == b'['
+            file.seek(0)
+            if not is_json:
+                models_list = filter(None, (line.decode('utf-8').strip() for line in file))
+            elif stream:
+                models_list = iter_json_array(file)
+            else:
+                models_list = json.load(file)
+            return build_model_index(models_list)
     except Exception as e:
         print(f"Error loading {file_path}: {e}")
-        return []
+        return build_model_index(())
+
+def parse_model_key(model):
+    """Split a model ID into provider, name, base and suffix."""
+    provider, _, name = model.partition('/')
+    base, _, suffix = model.partition(':')
+    return ModelKey(provider, name, base, suffix, model)
+
+def model_version_key(key):
+    """Sort key that compares the numbers in a model ID as integers, with the ID as tiebreaker."""
+    return tuple(int(number) for number in VERSION_NUMBER_RE.findall(key.full)), key.full
 
-def extract_models_by_category(models_list):
-    """Extract models organized by category from the OpenRouter output."""
+def build_model_index(models_list):
+    """Organize the OpenRouter output by category and build the model lookup tables in one pass."""
     categories = {}
-    current_category = None
+    all_models = set()
+    free_models = set()
+    by_base = {}
+    by_provider = {}
+    trie_by_provider = {}
+    bucket = None
     
     for item in models_list:
-        if item.startswith('---') and item.endswith('---'):
-            current_category = item.strip('-')
-        elif current_category and not item.startswith('---'):
-            if current_category not in categories:
-                categories[current_category] = []
-            categories[current_category].append(item)
+        # The slice check keeps the regex off the common, non-header path
+        if item[:3] == '---':
+            # Malformed headers are skipped too, never taken for model IDs
+            header = CATEGORY_HEADER_RE.match(item)
+            if header:
+                bucket = categories.setdefault(header.group(1), [])
+            continue
+        if bucket is None:
+            continue
+        
+        bucket.append(item)
+        
+        # Keep free models (models with :free suffix) out of the version and replacement lookups
+        if item.endswith(':free'):
+            free_models.add(item)
+            continue
+        
+        all_models.add(item)
+        
+        # Parse each ID once; the lookup tables hold the parsed keys
+        key = parse_model_key(item)
+        by_base.setdefault(key.base, []).append(key)
+        
+        if key.name:
+            by_provider.setdefault(key.provider, []).append(key)
+            
+            # Index the '-'-separated name tokens; each node remembers the first model below it
+            node = trie_by_provider.setdefault(key.provider, {})
+            for token in key.name.split('-'):
+                node = node.setdefault(token, {})
+                node.setdefault(None, key)
+    
+    # Reduce each base to its latest version up front so resolving a model is a single dict lookup
+    latest_by_base = {base: max(versions, key=model_version_key) for base, versions in by_base.items()}
     
-    return categories
+    return ModelIndex(categories, all_models, free_models, latest_by_base, by_provider, trie_by_provider)
 
-def find_latest_model_version(current_model, categories):
+def find_latest_model_version(current_model, index):
     """Find the latest version of a model based on the base model name."""
-    # Extract base model name (remove version suffixes)
-    base_model = current_model.split(':')[0] if ':' in current_model else current_model
-    
-    # Search through all categories for the latest version
-    latest_model = None
-    
-    for category, models in categories.items():
-        for model in models:
-            # Skip free models (models with :free suffix)
-            if model.endswith(':free'):
-                continue
-                
-            model_base = model.split(':')[0] if ':' in model else model
-            if model_base == base_model:
-                # If this is a newer version, update
-                if not latest_model or model > latest_model:
-                    latest_model = model
+    # Look up by base model name (version suffixes removed)
+    latest_key = index.latest_by_base.get(parse_model_key(current_model).base)
+    if latest_key:
+        return latest_key.full
     
     # If no exact match found, try to find newer versions of the same model family
-    if not latest_model:
-        latest_model = find_newer_model_family(current_model, categories)
-    
-    return latest_model
+    return find_newer_model_family(current_model, index)
 
-def find_newer_model_family(current_model, categories):
+def find_newer_model_family(current_model, index):
     """Find newer versions of the same model family (e.g., claude-3.7 -> claude-4)."""
-    # Define model family mappings for major version upgrades
-    model_families = {
-        'anthropic/claude-3.7-sonnet': ['anthropic/claude-4-sonnet', 'anthropic/claude-4'],
-        'anthropic/claude-3.7-sonnet:thinking': ['anthropic/claude-4-sonnet:thinking', 'anthropic/claude-4:thinking'],
-        'anthropic/claude-3.5-sonnet': ['anthropic/claude-4-sonnet', 'anthropic/claude-4'],
-        'anthropic/claude-3.5-sonnet:thinking': ['anthropic/claude-4-sonnet:thinking', 'anthropic/claude-4:thinking'],
-        'anthropic/claude-3-opus': ['anthropic/claude-4-opus', 'anthropic/claude-4'],
-        'anthropic/claude-3-opus:thinking': ['anthropic/claude-4-opus:thinking', 'anthropic/claude-4:thinking'],
-        'anthropic/claude-3-haiku': ['anthropic/claude-4-haiku', 'anthropic/claude-4'],
-        'anthropic/claude-3-haiku:thinking': ['anthropic/claude-4-haiku:thinking', 'anthropic/claude-4:thinking'],
-        'openai/gpt-4': ['openai/gpt-4o', 'openai/gpt-4o-latest'],
-        'openai/gpt-4-turbo': ['openai/gpt-4o', 'openai/gpt-4o-latest'],
-        'openai/gpt-4-turbo-preview': ['openai/gpt-4o', 'openai/gpt-4o-latest'],
-        'openai/gpt-4-1106-preview': ['openai/gpt-4o', 'openai/gpt-4o-latest'],
-        'openai/gpt-4-0125-preview': ['openai/gpt-4o', 'openai/gpt-4o-latest'],
-        'openai/gpt-4-0613': ['openai/gpt-4o', 'openai/gpt-4o-latest'],
-        'openai/gpt-4-0314': ['openai/gpt-4o', 'openai/gpt-4o-latest'],
-        'openai/gpt-3.5-turbo': ['openai/gpt-4o-mini', 'openai/o4-mini'],
-        'openai/gpt-3.5-turbo-16k': ['openai/gpt-4o-mini', 'openai/o4-mini'],
-        'google/gemini-2.0': ['google/gemini-2.5-pro', 'google/gemini-2.5-pro-exp-03-25'],
-        'google/gemini-1.5': ['google/gemini-2.5-pro', 'google/gemini-2.5-pro-exp-03-25'],
-        'google/gemini-1.0': ['google/gemini-2.5-pro', 'google/gemini-2.5-pro-exp-03-25'],
-        'deepseek/deepseek-chat-v2': ['deepseek/deepseek-chat-v3', 'deepseek/deepseek-chat-v3-0324'],
-        'deepseek/deepseek-chat-v1': ['deepseek/deepseek-chat-v3', 'deepseek/deepseek-chat-v3-0324'],
-        'x-ai/grok-2': ['x-ai/grok-3', 'x-ai/grok-3-beta'],
-        'x-ai/grok-1': ['x-ai/grok-3', 'x-ai/grok-3-beta'],
-        'mistralai/mistral-7b': ['mistralai/mistral-8x7b', 'mistralai/mistral-large'],
-        'mistralai/mistral-medium': ['mistralai/mistral-large', 'mistralai/mistral-large-latest'],
-        'meta-llama/llama-2': ['meta-llama/llama-3', 'meta-llama/llama-3.1'],
-        'meta-llama/llama-2-70b': ['meta-llama/llama-3.1-70b', 'meta-llama/llama-3.1-405b'],
-        'meta-llama/llama-2-13b': ['meta-llama/llama-3.1-8b', 'meta-llama/llama-3.1-70b'],
-        'meta-llama/llama-2-7b': ['meta-llama/llama-3.1-8b', 'meta-llama/llama-3.1-70b'],
-    }
-    
     # Check if current model has a newer family version
-    if current_model in model_families:
-        for newer_model in model_families[current_model]:
-            # Check if the newer model exists in available models
-            for category, models in categories.items():
-                for model in models:
-                    if model.endswith(':free'):
-                        continue
-                    if model == newer_model:
-                        return newer_model
+    for newer_model in MODEL_FAMILIES.get(current_model, ()):
+        # Check if the newer model exists in available models
+        if validate_model_exists(newer_model, index):
+            return newer_model
     
     return None
 
-def validate_model_exists(model_name, categories):
+def validate_model_exists(model_name, index):
     """Check if a model exists in the available models."""
-    for category, models in categories.items():
-        for model in models:
-            if model == model_name:
-                return True
-    return False
+    return model_name in index.all_models or model_name in index.free_models
 
-def find_valid_replacement_model(invalid_model, categories):
+def find_valid_replacement_model(invalid_model, index):
     """Find a valid replacement for an invalid model."""
-    # Define replacement mappings for common invalid models
-    replacement_mappings = {
-        'google/gemini-2.5-flash-preview': 'google/gemini-2.5-pro-exp-03-25',
-        'google/gemini-2.5-flash-preview:thinking': 'google/gemini-2.5-pro-exp-03-25',
-        'google/gemini-2.5-pro-preview-03-25': 'google/gemini-2.5-pro-exp-03-25',
-        'google/gemini-2.5-pro-preview': 'google/gemini-2.5-pro-exp-03-25',
-        'google/gemini-2.0-flash': 'google/gemini-2.5-pro-exp-03-25',
-        'google/gemini-2.0-pro': 'google/gemini-2.5-pro-exp-03-25',
-        'google/gemini-1.5-pro': 'google/gemini-2.5-pro-exp-03-25',
-        'google/gemini-1.5-flash': 'google/gemini-2.5-pro-exp-03-25',
-        'openai/gpt-4-turbo': 'openai/gpt-4o-latest',
-        'openai/gpt-4-turbo-preview': 'openai/gpt-4o-latest',
-        'openai/gpt-4-1106-preview': 'openai/gpt-4o-latest',
-        'openai/gpt-4-0125-preview': 'openai/gpt-4o-latest',
-        'openai/gpt-4-0613': 'openai/gpt-4o-latest',
-        'openai/gpt-4-0314': 'openai/gpt-4o-latest',
-        'openai/gpt-3.5-turbo': 'openai/o4-mini',
-        'openai/gpt-3.5-turbo-16k': 'openai/o4-mini',
-        'anthropic/claude-3.5-sonnet': 'anthropic/claude-3.7-sonnet',
-        'anthropic/claude-3.5-sonnet:thinking': 'anthropic/claude-3.7-sonnet:thinking',
-        'anthropic/claude-3-opus': 'anthropic/claude-3.7-sonnet',
-        'anthropic/claude-3-opus:thinking': 'anthropic/claude-3.7-sonnet:thinking',
-        'anthropic/claude-3-haiku': 'anthropic/claude-3.7-sonnet',
-        'anthropic/claude-3-haiku:thinking': 'anthropic/claude-3.7-sonnet:thinking',
-        'deepseek/deepseek-chat-v2': 'deepseek/deepseek-chat-v3-0324',
-        'deepseek/deepseek-chat-v1': 'deepseek/deepseek-chat-v3-0324',
-        'x-ai/grok-2': 'x-ai/grok-3-beta',
-        'x-ai/grok-1': 'x-ai/grok-3-beta',
-        'mistralai/mistral-7b': 'mistralai/mistral-large',
-        'mistralai/mistral-medium': 'mistralai/mistral-large',
-        'meta-llama/llama-2': 'meta-llama/llama-3.1-8b',
-        'meta-llama/llama-2-70b': 'meta-llama/llama-3.1-70b',
-        'meta-llama/llama-2-13b': 'meta-llama/llama-3.1-8b',
-        'meta-llama/llama-2-7b': 'meta-llama/llama-3.1-8b',
-    }
-    
     # Check if we have a direct replacement mapping
-    if invalid_model in replacement_mappings:
-        replacement = replacement_mappings[invalid_model]
-        if validate_model_exists(replacement, categories):
+    if invalid_model in REPLACEMENT_MAPPINGS:
+        replacement = REPLACEMENT_MAPPINGS[invalid_model]
+        if validate_model_exists(replacement, index):
             return replacement
     
     # Try to find a similar model by extracting the provider and model family
-    parts = invalid_model.split('/')
-    if len(parts) == 2:
-        provider, model_name = parts
+    invalid_key = parse_model_key(invalid_model)
+    if invalid_key.name:
+        # Follow the tokens shared with models from the same provider; the deepest match is the closest family
+        node = index.trie_by_provider.get(invalid_key.provider, {})
+        closest_key = None
+        for part in invalid_key.name.split('-'):
+            node = node.get(part)
+            if node is None:
+                break
+            closest_key = node[None]
         
-        # Look for models from the same provider
-        for category, models in categories.items():
-            for model in models:
-                if model.endswith(':free'):
-                    continue
-                    
-                if model.startswith(f"{provider}/"):
-                    # Check if it's a similar model family
-                    model_parts = model.split('/')[1].split('-')
-                    invalid_parts = model_name.split('-')
-                    
-                    # If they share common parts, it might be a good replacement
-                    if any(part in model for part in invalid_parts[:2]):
-                        return model
+        if closest_key:
+            return closest_key.full
     
     # Fallback: return the first available model from the same provider
-    for category, models in categories.items():
-        for model in models:
-            if model.endswith(':free'):
-                continue
-                
-            if model.startswith(f"{parts[0]}/"):
-                return model
+    provider_models = index.by_provider.get(invalid_key.provider)
+    if provider_models:
+        return provider_models[0].full
     
     return None
 
-def update_model_specs_with_latest_models(config, openrouter_models):
+def collect_referenced_models(config):
+    """Collect every model named in modelSpecs and custom endpoints."""
+    referenced = set()
+    
+    for spec in config.get('modelSpecs', {}).get('list', []):
+        preset = spec.get('preset')
+        if preset and 'model' in preset:
+            referenced.add(preset['model'])
+    
+    for endpoint in config.get('endpoints', {}).get('custom', []):
+        current_models = endpoint.get('models', {}).get('default')
+        if current_models is not None:
+            referenced.update(current_models)
+    
+    return referenced
+
+def resolve_models(models, index):
+    """Resolve each model once to its replacement (if invalid) or latest version, falling back to itself."""
+    resolved = {}
+    for model in models:
+        if validate_model_exists(model, index):
+            new_model = find_latest_model_version(model, index)
+        else:
+            new_model = find_valid_replacement_model(model, index)
+        resolved[model] = new_model or model
+    return resolved
+
+def update_model_specs_with_latest_models(config, index, resolved):
     """Update modelSpecs with the latest OpenRouter models."""
     if 'modelSpecs' not in config:
         config['modelSpecs'] = {}
@@ -214,12 +305,11 @@ def update_model_specs_with_latest_models(config, openrouter_models):
     if 'list' not in config['modelSpecs']:
         config['modelSpecs']['list'] = []
     
-    # Extract models by category
-    categories = extract_models_by_category(openrouter_models)
-    
-    print(f"📊 Found {len(categories)} model categories:")
-    for category, models in categories.items():
-        print(f"  - {category}: {len(models)} models")
+    # Collect the log and write it out in one go instead of one print per model
+    lines = []
+    lines.append(f"📊 Found {len(index.categories)} model categories:")
+    for category, models in index.categories.items():
+        lines.append(f"  - {category}: {len(models)} models")
     
     # Update existing modelSpecs with latest models
     updated_specs = []
@@ -227,88 +317,87 @@ def update_model_specs_with_latest_models(config, openrouter_models):
     replacements_made = 0
     
     for spec in config['modelSpecs']['list']:
-        if 'preset' in spec and 'model' in spec['preset']:
-            current_model = spec['preset']['model']
+        preset = spec.get('preset')
+        if preset and 'model' in preset:
+            current_model = preset['model']
+            # Presets shared through YAML aliases may already hold a model written earlier in this pass
+            new_model = resolved.get(current_model, current_model)
             
             # Check if current model exists
-            if not validate_model_exists(current_model, categories):
-                print(f"❌ Invalid model: {current_model}")
-                # Try to find a valid replacement
-                replacement_model = find_valid_replacement_model(current_model, categories)
-                if replacement_model:
-                    print(f"🔄 Replacing {current_model} → {replacement_model}")
-                    spec['preset']['model'] = replacement_model
+            if not validate_model_exists(current_model, index):
+                lines.append(f"❌ Invalid model: {current_model}")
+                if new_model != current_model:
+                    lines.append(f"🔄 Replacing {current_model} → {new_model}")
+                    preset['model'] = new_model
                     if 'modelLabel' in spec:
-                        spec['modelLabel'] = replacement_model
+                        spec['modelLabel'] = new_model
                     replacements_made += 1
                 else:
-                    print(f"❌ Could not find replacement for {current_model}, keeping as is")
+                    lines.append(f"❌ Could not find replacement for {current_model}, keeping as is")
                 updated_specs.append(spec)
                 continue
             
-            # Find the latest version of this model
-            latest_model = find_latest_model_version(current_model, categories)
-            
-            if latest_model and latest_model != current_model:
-                print(f"🔄 Updating {current_model} → {latest_model}")
-                spec['preset']['model'] = latest_model
+            if new_model != current_model:
+                lines.append(f"🔄 Updating {current_model} → {new_model}")
+                preset['model'] = new_model
                 if 'modelLabel' in spec:
-                    spec['modelLabel'] = latest_model
+                    spec['modelLabel'] = new_model
                 updates_made += 1
             else:
-                print(f"✅ Keeping {current_model} (already latest)")
+                lines.append(f"✅ Keeping {current_model} (already latest)")
         
         updated_specs.append(spec)
     
     config['modelSpecs']['list'] = updated_specs
     
-    print(f"\n📈 Summary: Updated {updates_made} model specifications, replaced {replacements_made} invalid models")
+    lines.append(f"\n📈 Summary: Updated {updates_made} model specifications, replaced {replacements_made} invalid models")
+    sys.stdout.write('\n'.join(lines) + '\n')
     return config
 
-def update_endpoints_with_latest_models(config, openrouter_models):
+def update_endpoints_with_latest_models(config, index, resolved):
     """Update endpoints with the latest OpenRouter models."""
     if 'endpoints' not in config or 'custom' not in config['endpoints']:
         return config
     
-    # Extract models by category
-    categories = extract_models_by_category(openrouter_models)
-    
+    lines = []
     for endpoint in config['endpoints']['custom']:
-        if 'models' in endpoint and 'default' in endpoint['models']:
-            current_models = endpoint['models']['default']
-            updated_models = []
+        current_models = endpoint.get('models', {}).get('default')
+        if current_models is not None:
+            # Most endpoints are already current; skip them before touching the list
+            if all(
+                validate_model_exists(current_model, index) and resolved.get(current_model, current_model) == current_model
+                for current_model in current_models
+            ):
+                continue
+            
             updates_made = 0
             replacements_made = 0
             
-            for current_model in current_models:
+            # Update the list in place
+            for position, current_model in enumerate(current_models):
+                new_model = resolved.get(current_model, current_model)
+                
                 # Check if current model exists
-                if not validate_model_exists(current_model, categories):
-                    print(f"❌ Invalid model in endpoint: {current_model}")
-                    # Try to find a valid replacement
-                    replacement_model = find_valid_replacement_model(current_model, categories)
-                    if replacement_model:
-                        print(f"🔄 Replacing endpoint model {current_model} → {replacement_model}")
-                        updated_models.append(replacement_model)
+                if not validate_model_exists(current_model, index):
+                    lines.append(f"❌ Invalid model in endpoint: {current_model}")
+                    if new_model != current_model:
+                        lines.append(f"🔄 Replacing endpoint model {current_model} → {new_model}")
+                        current_models[position] = new_model
                         replacements_made += 1
                     else:
-                        print(f"❌ Could not find replacement for {current_model}, keeping as is")
-                        updated_models.append(current_model)
+                        lines.append(f"❌ Could not find replacement for {current_model}, keeping as is")
                     continue
                 
-                latest_model = find_latest_model_version(current_model, categories)
-                
-                if latest_model and latest_model != current_model:
-                    print(f"🔄 Updating endpoint model {current_model} → {latest_model}")
-                    updated_models.append(latest_model)
+                if new_model != current_model:
+                    lines.append(f"🔄 Updating endpoint model {current_model} → {new_model}")
+                    current_models[position] = new_model
                     updates_made += 1
-                else:
-                    updated_models.append(current_model)
-            
-            endpoint['models']['default'] = updated_models
             
             if updates_made > 0 or replacements_made > 0:
-                print(f"📊 Updated {updates_made} models, replaced {replacements_made} invalid models in endpoint '{endpoint.get('name', 'Unknown')}'")
+                lines.append(f"📊 Updated {updates_made} models, replaced {replacements_made} invalid models in endpoint '{endpoint.get('name', 'Unknown')}'")
     
+    if lines:
+        sys.stdout.write('\n'.join(lines) + '\n')
     return config
 
 def main():
@@ -319,21 +408,36 @@ def main():
         return False
     
     print("🔄 Loading OpenRouter models...")
-    openrouter_models = load_openrouter_models('openrouter.txt')
-    if not openrouter_models:
+    # The lookup tables are built once here and shared across both updates
+    index = load_openrouter_models('openrouter.txt')
+    if not index.categories:
         print("❌ Failed to load openrouter.txt")
         return False
     
-    print(f"📊 Loaded {len(openrouter_models)} models from OpenRouter")
+    print(f"📊 Loaded {sum(len(models) for models in index.categories.values())} models from OpenRouter")
+    
+    # Resolve each referenced model once, however many specs and endpoints name it
+    resolved = resolve_models(collect_referenced_models(config), index)
     
     print("\n🔄 Updating model specifications with latest models...")
-    config = update_model_specs_with_latest_models(config, openrouter_models)
+    config = update_model_specs_with_latest_models(config, index, resolved)
     
     print("\n🔄 Updating endpoints with latest models...")
-    config = update_endpoints_with_latest_models(config, openrouter_models)
+    config = update_endpoints_with_latest_models(config, index, resolved)
     
     print("\n💾 Saving updated configuration...")
-    if save_yaml_file('librechat.yaml', config):
+    # Serialize before opening the file, so a failed dump never leaves librechat.yaml half-written
+    blob = dump_yaml(config)
+    if blob is None:
+        print("❌ Failed to save updated configuration")
+        return False
+    
+    # Skip the write on no-op runs so file watchers aren't triggered needlessly
+    if blob == load_text_file('librechat.yaml'):
+        print("✅ Configuration already up to date, librechat.yaml left unchanged")
+        return True
+    
+    if save_yaml_file('librechat.yaml', blob):
         print("✅ Configuration updated successfully!")
         return True
     else: